@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# File : echotorch/nn/BatchedESN.py
+# Description : Independent Echo State Networks run together.
+# Date : 15th of October, 2026
+#
+# This file is part of EchoTorch.  EchoTorch is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright Nils Schaetti <nils.schaetti@unine.ch>
+
+# Imports
+import torch
+import torch.nn as nn
+from .ESN import ESN
+
+
+# Independent Echo State Networks run together
+class BatchedESN(nn.Module):
+    """
+    Independent Echo State Networks run together. The K reservoirs are stacked in (K x N x N) and (K x N x D)
+    matrices and updated with one batched product per step, each ESN keeps its own output layer.
+    """
+
+    # Constructor
+    def __init__(self, esns):
+        """
+        Constructor
+        :param esns: List of ESN/LiESN modules, or of dicts of ESN arguments, with the same sizes and without feedbacks
+        """
+        super(BatchedESN, self).__init__()
+
+        # Build ESNs from their arguments
+        esns = [ESN(**esn) if isinstance(esn, dict) else esn for esn in esns]
+        cells = [esn.esn_cell for esn in esns]
+
+        # Same sizes
+        if len(set((cell.input_dim, cell.output_dim, esn.output.output_dim) for esn, cell in zip(esns, cells))) != 1:
+            raise ValueError(u"ESNs must have the same input, reservoir and output sizes")
+        # end if
+
+        # No feedbacks
+        if any(cell.feedbacks for cell in cells):
+            raise ValueError(u"ESNs with feedbacks can not be batched")
+        # end if
+
+        # Same activation function and precision
+        if len(set(cell.nonlin_func for cell in cells)) != 1 or len(set(esn.dtype for esn in esns)) != 1:
+            raise ValueError(u"ESNs must have the same activation function and dtype")
+        # end if
+
+        # Properties
+        self.n_esns = len(esns)
+        self.input_dim = cells[0].input_dim
+        self.hidden_dim = cells[0].output_dim
+        self.dtype = esns[0].dtype
+        self.nonlin_func = cells[0].nonlin_func
+        self.washouts = [esn.washout for esn in esns]
+
+        # Stacked matrices, W transposed for X.W^T
+        self.register_buffer('w_t', torch.stack([self._dense(cell.w).t() for cell in cells]))
+        self.register_buffer('w_in', torch.stack([self._dense(cell.w_in) for cell in cells]))
+        self.register_buffer('w_bias', torch.stack([self._dense(cell.w_bias).view(1, -1) for cell in cells]))
+
+        # Leaky rates, 1 for ESN
+        self.register_buffer('leaky_rate', torch.tensor(
+            [float(cell.leaky_rate) if hasattr(cell, 'leaky_rate') else 1.0 for cell in cells], dtype=self.dtype
+        ).view(-1, 1, 1))
+
+        # Output layers
+        self.outputs = nn.ModuleList([esn.output for esn in esns])
+    # end __init__
+
+    ###############################################
+    # PUBLIC
+    ###############################################
+
+    # Reset learning
+    def reset(self):
+        """
+        Reset learning
+        :return:
+        """
+        for output in self.outputs:
+            output.reset()
+        # end for
+
+        # Training mode again
+        self.train(True)
+    # end reset
+
+    # Forward
+    def forward(self, u, y=None):
+        """
+        Forward
+        :param u: Input signal (batch x time x input dim), shared by the ESNs
+        :param y: Target outputs
+        :return: List of the outputs (or hidden states in training) of each ESN
+        """
+        # Hidden states
+        hidden_states = self.hidden_states(u)
+
+        # Learning algo of each ESN
+        return [
+            output(hidden_states[k], y, washout=self.washouts[k]) for k, output in enumerate(self.outputs)
+        ]
+    # end forward
+
+    # Hidden states of the ESNs
+    def hidden_states(self, u):
+        """
+        Hidden states of the ESNs, each sequence starts from a zero state
+        :param u: Input signal (batch x time x input dim)
+        :return: Hidden states (n ESNs x batch x time x reservoir size)
+        """
+        # Sizes
+        n_batches = int(u.size(0))
+        time_length = int(u.size(1))
+
+        # Win.u + b for every ESN and step in one product (K x B x T x N)
+        u_proj = torch.matmul(u.to(self.w_in.dtype).unsqueeze(0), self.w_in.transpose(1, 2).unsqueeze(1))
+        u_proj += self.w_bias.unsqueeze(1)
+
+        # Leaky ESNs
+        leaky = bool(torch.any(self.leaky_rate != 1.0))
+
+        # States of the K reservoirs for all sequences (K x B x N)
+        x = torch.zeros(self.n_esns, n_batches, self.hidden_dim, dtype=self.w_t.dtype, device=self.w_t.device)
+        hidden_states = torch.empty(
+            self.n_esns, n_batches, time_length, self.hidden_dim, dtype=self.dtype, device=self.w_t.device
+        )
+
+        # For each steps
+        for t in range(time_length):
+            # Update of all reservoirs
+            x_new = self.nonlin_func(torch.baddbmm(u_proj[:, :, t], x, self.w_t))
+
+            # Leaky integration
+            if leaky:
+                x.lerp_(x_new, self.leaky_rate)
+            else:
+                x = x_new
+            # end if
+
+            # Save
+            hidden_states[:, :, t] = x
+        # end for
+
+        return hidden_states
+    # end hidden_states
+
+    # Finish training
+    def finalize(self):
+        """
+        Finalize training of each output layer
+        """
+        for output in self.outputs:
+            output.finalize()
+        # end for
+
+        # Not in training mode anymore
+        self.train(False)
+    # end finalize
+
+    ###############################################
+    # PRIVATE
+    ###############################################
+
+    # Dense matrix in the ESNs' precision
+    def _dense(self, m):
+        """
+        Dense matrix in the ESNs' precision
+        :param m: Dense or sparse matrix
+        :return: Dense matrix
+        """
+        if m.layout != torch.strided:
+            m = m.to_dense()
+        # end if
+        return m.to(self.dtype)
+    # end _dense
+
+# end BatchedESN
@@ -44,7 +44,9 @@ class ESN(nn.Module):
                  feedbacks=False, with_bias=True, wfdb_sparsity=None, normalize_feedbacks=False,
                  softmax_output=False, seed=None, washout=0, w_distrib='uniform', win_distrib='uniform',
                  wbias_distrib='uniform', win_normal=(0.0, 1.0), w_normal=(0.0, 1.0), wbias_normal=(0.0, 1.0),
-                 dtype=torch.float32):
+                 dtype=torch.float32, sr_iterations=50, sparse=False, compile_step=False,
+                 compute_dtype=None, chunk_size=None, device=None, cache_matrices=False, use_cuda_graph=False,
+                 save_matrices=True, solve_device=None, use_cuda_streams=False):
         """
         Constructor
         :param input_dim: Inputs dimension.
@@ -62,6 +64,17 @@ class ESN(nn.Module):
         :param w_sparsity:
         :param nonlin_func: Reservoir's activation function (tanh, sig, relu)
         :param learning_algo: Which learning algorithm to use (inv, LU, grad)
+        :param sr_iterations: Initial Arnoldi subspace size to estimate W's spectral radius above 512 units, doubled until the estimate is stable (None for a full eigendecomposition)
+        :param sparse: Store W as a sparse matrix if it is mostly zeros
+        :param compile_step: Compile the reservoir update with torch.compile instead of TorchScript
+        :param compute_dtype: Precision of W and Win for the update (e.g. torch.bfloat16), the state stays in dtype
+        :param chunk_size: In training, run the reservoir by chunks of chunk_size steps and only keep x^T.x and x^T.y
+        :param device: Device on which the matrices are generated and kept (default: CPU)
+        :param cache_matrices: Reuse the scaled W of a previous ESN generated with the same seed and parameters
+        :param use_cuda_graph: On GPU, replay the update of small reservoirs (< 512 units) as a captured CUDA graph
+        :param save_matrices: Keep the reservoir matrices in the state dict, if False those generated from the seed are left out
+        :param solve_device: Device on which finalize solves the ridge regression (e.g. 'cuda')
+        :param use_cuda_streams: On GPU, run chunks of at least 8 sequences concurrently on CUDA streams
         """
         super(ESN, self).__init__()
 
@@ -72,17 +85,32 @@ class ESN(nn.Module):
         self.normalize_feedbacks = normalize_feedbacks
         self.washout = washout
         self.dtype = dtype
+        self.chunk_size = chunk_size
+        self.use_cuda_graph = use_cuda_graph
+        self.use_cuda_streams = use_cuda_streams
+
+        # Captured CUDA graphs of the update with their static state and input, and the W they read
+        self._cuda_graphs = dict()
+        self._cuda_graphs_w = None
 
         # Recurrent layer
         if create_cell:
             self.esn_cell = ESNCell(input_dim, hidden_dim, spectral_radius, bias_scaling, input_scaling, w, w_in,
                                     w_bias, w_fdb, sparsity, input_set, w_sparsity, nonlin_func, feedbacks, output_dim,
                                     wfdb_sparsity, normalize_feedbacks, seed, w_distrib, win_distrib, wbias_distrib,
-                                    win_normal, w_normal, wbias_normal, dtype)
+                                    win_normal, w_normal, wbias_normal, dtype, sr_iterations, sparse, compile_step,
+                                    compute_dtype, device, cache_matrices, save_matrices)
         # end if
 
         # Ouput layer
-        self.output = RRCell(hidden_dim, output_dim, ridge_param, feedbacks, with_bias, learning_algo, softmax_output, dtype)
+        self.output = RRCell(hidden_dim, output_dim, ridge_param, feedbacks, with_bias, learning_algo, softmax_output, dtype,
+                             solve_device=solve_device)
+        if device is not None:
+            self.output.to(device)
+        # end if
+
+        # Forward of the current mode, unbound so that the module does not reference itself
+        self._forward_impl = type(self)._forward_train
     # end __init__
 
     ###############################################
@@ -161,25 +189,23 @@ class ESN(nn.Module):
         Forward
         :param u: Input signal.
         :param y: Target outputs
-        :return: Output or hidden states
+        :return: Output or hidden states (None in training with chunk_size)
         """
-        # Compute hidden states
-        if self.feedbacks and self.training:
-            hidden_states = self.esn_cell(u, y, reset_state=reset_state)
-        elif self.feedbacks and not self.training:
-            hidden_states = self.esn_cell(u, w_out=self.output.w_out, reset_state=reset_state)
-        else:
-            hidden_states = self.esn_cell(u, reset_state=reset_state)
-        # end if
-
-        # Learning algo
-        if y is not None:
-            return self.output(hidden_states[:, self.washout:], y[:, self.washout:])
-        else:
-            return self.output(hidden_states[:, self.washout:], y)
-        # end if
+        return self._forward_impl(self, u, y, reset_state)
     # end forward
 
+    # Set training or evaluation mode
+    def train(self, mode=True):
+        """
+        Set training or evaluation mode, and the forward of this mode
+        :param mode: Training mode (True) or evaluation mode (False)
+        :return: self
+        """
+        super(ESN, self).train(mode)
+        self._forward_impl = type(self)._forward_train if mode else type(self)._forward_eval
+        return self
+    # end train
+
     # Finish training
     def finalize(self):
         """
@@ -210,4 +236,299 @@ class ESN(nn.Module):
         return self.esn_cell.get_spectral_raduis()
     # end spectral_radius
 
+    ###############################################
+    # PRIVATE
+    ###############################################
+
+    # Forward in training mode
+    def _forward_train(self, u, y, reset_state):
+        """
+        Forward in training mode
+        :param u: Input signal
+        :param y: Target outputs
+        :param reset_state: Reset the state before each sequence
+        :return: Hidden states (None with chunk_size)
+        """
+        # Training by chunks
+        if y is not None and self.chunk_size is not None:
+            self._accumulate_chunks(u, y, reset_state)
+            return None
+        # end if
+
+        # Compute hidden states, with teacher forcing
+        if self.feedbacks:
+            hidden_states = self._empty_hidden_states(u)
+            self.esn_cell(u, y, reset_state=reset_state, out=hidden_states, washout=self.washout)
+        else:
+            hidden_states = self._hidden_states(u, reset_state)
+        # end if
+
+        # Learning algo, the hidden states start after the washout
+        return self.output(hidden_states, y[:, self.washout:] if y is not None else None)
+    # end _forward_train
+
+    # Forward in evaluation mode
+    def _forward_eval(self, u, y, reset_state):
+        """
+        Forward in evaluation mode
+        :param u: Input signal
+        :param y: Target outputs (unused)
+        :param reset_state: Reset the state before each sequence
+        :return: Outputs
+        """
+        # Compute hidden states, with the outputs fed back
+        if self.feedbacks:
+            hidden_states = self._empty_hidden_states(u)
+            self.esn_cell(u, w_out=self.output.w_out, reset_state=reset_state, out=hidden_states, washout=self.washout)
+        else:
+            hidden_states = self._hidden_states(u, reset_state)
+        # end if
+
+        # Outputs after the washout
+        return self.output(hidden_states)
+    # end _forward_eval
+
+    # Tensor for the hidden states
+    def _empty_hidden_states(self, u):
+        """
+        Tensor for the hidden states after the washout, filled in place by the cell
+        :param u: Input signal
+        :return: Uninitialized hidden states
+        """
+        return torch.empty(
+            u.size(0), max(u.size(1) - self.washout, 0), self.esn_cell.output_dim, dtype=self.dtype, device=self.esn_cell.hidden.device
+        )
+    # end _empty_hidden_states
+
+    # Compute hidden states without feedbacks
+    def _hidden_states(self, u, reset_state):
+        """
+        Compute hidden states without feedbacks
+        :param u: Input signal
+        :param reset_state: Reset the state before each sequence
+        :return: Hidden states
+        """
+        hidden_states = self._empty_hidden_states(u)
+        if reset_state and u.is_cuda and self._graph_capturable():
+            self._graph_hidden_states(u, hidden_states)
+        elif reset_state and u.is_cuda and u.size(0) >= 8 and self.use_cuda_streams and self._batchable():
+            self._parallel_hidden_states(u, hidden_states)
+        else:
+            self.esn_cell(u, reset_state=reset_state, out=hidden_states, washout=self.washout)
+        # end if
+        return hidden_states
+    # end _hidden_states
+
+    # Train the output layer chunk by chunk
+    def _accumulate_chunks(self, u, y, reset_state):
+        """
+        Train the output layer chunk by chunk, only the hidden states of one chunk are kept in memory
+        :param u: Input signal
+        :param y: Target outputs
+        :param reset_state: Reset the hidden state at the start of each sequence
+        """
+        # Sizes
+        n_batches = int(u.size(0))
+        time_length = int(u.size(1))
+
+        # Hidden states of one chunk, reused for every chunk
+        hidden_states = torch.empty(
+            1, self.chunk_size, self.esn_cell.output_dim, dtype=self.dtype, device=self.esn_cell.hidden.device
+        )
+
+        # For each sequence, the hidden state is carried over from one chunk to the next
+        for b in range(n_batches):
+            for start in range(0, time_length, self.chunk_size):
+                # Current chunk
+                length = min(self.chunk_size, time_length - start)
+                u_chunk = u[b:b + 1].narrow(1, start, length)
+                y_chunk = y[b:b + 1].narrow(1, start, length)
+
+                # Part of the washout in this chunk, not stored by the cell
+                washout = min(max(self.washout - start, 0), length)
+                h_chunk = hidden_states.narrow(1, 0, length - washout)
+
+                # Compute hidden states
+                if self.feedbacks:
+                    self.esn_cell(u_chunk, y_chunk, reset_state=reset_state and start == 0, out=h_chunk, washout=washout)
+                else:
+                    self.esn_cell(u_chunk, reset_state=reset_state and start == 0, out=h_chunk, washout=washout)
+                # end if
+
+                # Accumulate x^T.x and x^T.y after the washout
+                self.output.accumulate(
+                    h_chunk,
+                    y_chunk.narrow(1, washout, length - washout),
+                    sample_length=time_length - self.washout
+                )
+            # end for
+        # end for
+    # end _accumulate_chunks
+
+    # Can the sequences be updated together
+    def _batchable(self):
+        """
+        Can the sequences be updated together, X = f(X.W^T + U_t.Win^T + b) (plain ESN cell with a dense W, no feedbacks)
+        :return: True or False
+        """
+        return type(self.esn_cell) is ESNCell and self.esn_cell.w.layout == torch.strided
+    # end _batchable
+
+    # Projected inputs Win.u + b
+    def _projected_inputs(self, u):
+        """
+        Projected inputs Win.u + b for the whole sequences, in one product
+        :param u: Input signal
+        :return: Projected inputs (batch x time x reservoir size)
+        """
+        u_proj = torch.matmul(u.to(self.esn_cell.w_in.dtype), self.esn_cell.w_in.t())
+        u_proj += self.esn_cell.w_bias.view(-1).to(u_proj.dtype)
+        return u_proj
+    # end _projected_inputs
+
+    # Can the reservoir update be captured as a CUDA graph
+    def _graph_capturable(self):
+        """
+        Can the reservoir update be captured as a CUDA graph (small dense tanh ESN cell, no feedbacks)
+        :return: True or False
+        """
+        return (
+            self.use_cuda_graph and hasattr(torch.cuda, 'CUDAGraph') and self.esn_cell.output_dim ** 2 < 2 ** 18 and
+            self.esn_cell.nonlin_func is torch.tanh and self._batchable()
+        )
+    # end _graph_capturable
+
+    # Compute hidden states by replaying a CUDA graph of the update
+    def _graph_hidden_states(self, u, out):
+        """
+        Compute hidden states by replaying a CUDA graph of the update. Small reservoirs are bound by
+        kernel launches, the graph launches the update of the whole batch at once for each time step.
+        :param u: Input signal (on GPU)
+        :param out: Tensor for the hidden states after the washout
+        """
+        # Matrices
+        cell = self.esn_cell
+        w_t = cell.w.t()
+
+        # Win.u + b for the whole sequences, outside the graph
+        u_proj = self._projected_inputs(u)
+
+        # Graph of this batch size, captured on first use
+        graph, static_x, static_u = self._cuda_graph(u.size(0), w_t, u_proj.dtype, u.device)
+
+        # The sequences all start from a zero state
+        static_x.zero_()
+
+        # For each step
+        for t in range(u.size(1)):
+            static_u.copy_(u_proj[:, t])
+            graph.replay()
+            if t >= self.washout:
+                out[:, t - self.washout].copy_(static_x)
+            # end if
+        # end for
+
+        # Last state
+        cell.hidden.data = static_x[-1].to(cell.dtype).data
+    # end _graph_hidden_states
+
+    # CUDA graph of the update
+    def _cuda_graph(self, n_batches, w_t, dtype, device):
+        """
+        CUDA graph of the update x = tanh(x.W^T + p), captured on first use for a batch size, device and dtype
+        :param n_batches: Batch size
+        :param w_t: Transposed reservoir weight matrix
+        :param dtype: Precision of the projected inputs
+        :param device: CUDA device
+        :return: Graph, static state and static projected input
+        """
+        # Graphs read W's memory, a new W drops the graphs of the previous one
+        if self._cuda_graphs_w != w_t.data_ptr():
+            self._cuda_graphs.clear()
+            self._cuda_graphs_w = w_t.data_ptr()
+        # end if
+
+        # Graph already captured
+        key = (n_batches, str(device), dtype)
+        if key in self._cuda_graphs:
+            return self._cuda_graphs[key]
+        # end if
+
+        # Keep the graphs of a few batch sizes, the oldest is dropped
+        if len(self._cuda_graphs) >= 8:
+            del self._cuda_graphs[next(iter(self._cuda_graphs))]
+        # end if
+
+        # Static state and projected input
+        static_x = torch.zeros(n_batches, w_t.size(0), dtype=w_t.dtype, device=device)
+        static_u = torch.zeros(n_batches, w_t.size(0), dtype=dtype, device=device)
+
+        # Warm up on a side stream before capture
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(3):
+                torch.tanh(torch.addmm(static_u, static_x, w_t))
+            # end for
+        # end with
+        torch.cuda.current_stream().wait_stream(stream)
+
+        # Capture the update
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph):
+            static_x.copy_(torch.tanh(torch.addmm(static_u, static_x, w_t)))
+        # end with
+
+        self._cuda_graphs[key] = (graph, static_x, static_u)
+        return self._cuda_graphs[key]
+    # end _cuda_graph
+
+    # Compute hidden states of batch chunks concurrently
+    def _parallel_hidden_states(self, u, out):
+        """
+        Compute hidden states of batch chunks concurrently, each chunk on its own CUDA stream.
+        The sequences of a chunk are updated together with one product per step, and the
+        steps of the chunks are interleaved so that the streams overlap.
+        :param u: Input signal (on GPU)
+        :param out: Tensor for the hidden states after the washout
+        """
+        # Matrices
+        cell = self.esn_cell
+        w_t = cell.w.t()
+
+        # Win.u + b for the whole sequences
+        u_proj = self._projected_inputs(u)
+
+        # Chunks, their streams and states, every sequence starts from a zero state
+        chunks = list(zip(torch.chunk(u_proj, 4, dim=0), torch.chunk(out, 4, dim=0)))
+        streams = [torch.cuda.Stream() for _ in chunks]
+        states = [torch.zeros(p.size(0), cell.output_dim, dtype=cell.w.dtype, device=u.device) for p, _ in chunks]
+
+        # Streams start after the projection
+        current_stream = torch.cuda.current_stream()
+        for stream in streams:
+            stream.wait_stream(current_stream)
+        # end for
+
+        # For each step, launch the update of each chunk on its stream
+        for t in range(u.size(1)):
+            for k, (stream, (p_chunk, out_chunk)) in enumerate(zip(streams, chunks)):
+                with torch.cuda.stream(stream):
+                    states[k] = cell.nonlin_func(torch.addmm(p_chunk[:, t], states[k], w_t))
+                    if t >= self.washout:
+                        out_chunk[:, t - self.washout].copy_(states[k])
+                    # end if
+                # end with
+            # end for
+        # end for
+
+        # Wait for every chunk
+        for stream in streams:
+            current_stream.wait_stream(stream)
+        # end for
+
+        # Last state
+        cell.hidden.data = states[-1][-1].to(cell.dtype).data
+    # end _parallel_hidden_states
+
 # end ESNCell
@@ -30,6 +30,57 @@ from torch.autograd import Variable
 import torch.nn as nn
 import echotorch.utils
 import numpy as np
+from collections import OrderedDict
+
+
+# Unscaled W matrices of seeded generations with their spectral radius and the RNG states that followed,
+# least recently used first
+_w_cache = OrderedDict()
+
+# Maximum size of the cached W matrices in bytes
+_w_cache_max_bytes = 2 ** 30
+
+
+# Reservoir update x = tanh(W.x + p) with p = Win.u + b projected beforehand
+def _projected_step(x, u_proj_t, w):
+    """
+    Reservoir update x = tanh(W.x + p) with p = Win.u + b projected beforehand
+    :param x: Reservoir state
+    :param u_proj_t: Current projected input Win.u + b
+    :param w: Reservoir weight matrix
+    :return: Next reservoir state
+    """
+    return torch.tanh(torch.addmv(u_proj_t, w, x))
+# end _projected_step
+
+
+# TorchScript versions of the updates, built on first use
+_scripted_steps = dict()
+
+
+# torch.compile versions of the updates, built on first use
+_compiled_steps = dict()
+
+
+# Get the compiled version of an update
+def _get_step(step, compile_step=False):
+    """
+    Get the compiled version of an update
+    :param step: Update function
+    :param compile_step: Use torch.compile instead of TorchScript (if available)
+    :return: Compiled update function
+    """
+    if not compile_step or not hasattr(torch, 'compile'):
+        if step not in _scripted_steps:
+            _scripted_steps[step] = torch.jit.script(step)
+        # end if
+        return _scripted_steps[step]
+    # end if
+    if step not in _compiled_steps:
+        _compiled_steps[step] = torch.compile(step, dynamic=False)
+    # end if
+    return _compiled_steps[step]
+# end _get_step
 
 
 # Echo State Network layer
@@ -44,7 +95,8 @@ class ESNCell(nn.Module):
                  nonlin_func=torch.tanh, feedbacks=False, feedbacks_dim=None, wfdb_sparsity=None,
                  normalize_feedbacks=False, seed=None, w_distrib='uniform', win_distrib='uniform',
                  wbias_distrib='uniform', win_normal=(0.0, 1.0), w_normal=(0.0, 1.0), wbias_normal=(0.0, 1.0),
-                 dtype=torch.float32):
+                 dtype=torch.float32, sr_iterations=50, sparse=False, compile_step=False,
+                 compute_dtype=None, device=None, cache_matrices=False, save_matrices=True):
         """
         Constructor
         :param input_dim: Inputs dimension.
@@ -59,6 +111,13 @@ class ESNCell(nn.Module):
         :param input_set:
         :param w_sparsity:
         :param nonlin_func: Reservoir's activation function (tanh, sig, relu)
+        :param sr_iterations: Initial Arnoldi subspace size to estimate W's spectral radius above 512 units, doubled until the estimate is stable (None for a full eigendecomposition)
+        :param sparse: Store W as a sparse matrix if it is mostly zeros
+        :param compile_step: Compile the reservoir update with torch.compile instead of TorchScript
+        :param compute_dtype: Precision of W and Win for the update (e.g. torch.bfloat16), the state stays in dtype
+        :param device: Device on which the matrices are generated and kept (default: CPU)
+        :param cache_matrices: Reuse the scaled W of a previous cell generated with the same seed and parameters
+        :param save_matrices: Keep the matrices in the state dict, if False those generated from a seed are left out and regenerated on construction
         """
         super(ESNCell, self).__init__()
 
@@ -83,22 +142,47 @@ class ESNCell(nn.Module):
         self.w_normal = w_normal
         self.wbias_normal = wbias_normal
         self.dtype = dtype
+        self.sr_iterations = sr_iterations
+        self.sparse = sparse
+        self.compile_step = compile_step
+        self.compute_dtype = compute_dtype if compute_dtype is not None else dtype
+        self.device = device
+        self.cache_matrices = cache_matrices
+        self.save_matrices = save_matrices
 
         # Init hidden state
         self.register_buffer('hidden', self.init_hidden())
 
+        # Matrices generated from a seed can be left out of the state dict
+        regenerable = seed is not None and not save_matrices
+
+        # Given matrices as generators taking the matrix size, tensors are returned as is
+        w_gen, w_in_gen, w_bias_gen, w_fdb_gen = [self._as_generator(m) for m in (w, w_in, w_bias, w_fdb)]
+
         # Initialize input weights
-        self.register_buffer('w_in', self._generate_win(w_in, seed=seed))
+        self._register_matrix('w_in', self._generate_win(w_in_gen, seed=seed).to(self.compute_dtype), regenerable and w_in is None)
 
         # Initialize reservoir weights randomly
-        self.register_buffer('w', self._generate_w(w, seed=seed))
+        w_regenerable = regenerable and w is None
+        w = self._generate_w(w_gen, seed=seed).to(self.compute_dtype)
+
+        # Sparse storage, only worth it for sparsely connected reservoirs
+        if sparse and torch.mean((w == 0).float()) > 0.5:
+            w = w.to_sparse_csr() if hasattr(w, 'to_sparse_csr') else w.to_sparse()
+        # end if
+        self._register_matrix('w', w, w_regenerable)
+
+        # Scaling of a W left out of the state dict, so that it is rescaled as saved when loaded
+        if w_regenerable:
+            self.register_buffer('w_scaling', torch.tensor([self._w_scaling], dtype=torch.float64, device=self.device))
+        # end if
 
         # Initialize bias
-        self.register_buffer('w_bias', self._generate_wbias(w_bias, seed=seed))
+        self._register_matrix('w_bias', self._generate_wbias(w_bias_gen, seed=seed), regenerable and w_bias is None)
 
         # Initialize feedbacks weights randomly
         if feedbacks:
-            self.register_buffer('w_fdb', self._generate_wfdb(w_fdb, seed=seed))
+            self._register_matrix('w_fdb', self._generate_wfdb(w_fdb_gen, seed=seed), regenerable and w_fdb is None)
         # end if
     # end __init__
 
@@ -107,12 +191,14 @@ class ESNCell(nn.Module):
     ###############################################
 
     # Forward
-    def forward(self, u, y=None, w_out=None, reset_state=True):
+    def forward(self, u, y=None, w_out=None, reset_state=True, out=None, washout=0):
         """
         Forward
         :param u: Input signal
         :param y: Target output signal for teacher forcing
         :param w_out: Output weights for teacher forcing
+        :param out: Pre-allocated tensor for the hidden states (batch x time - washout x reservoir size)
+        :param washout: Number of initial time steps run without storing their states
         :return: Resulting hidden states
         """
         # Time length
@@ -121,9 +207,27 @@ class ESNCell(nn.Module):
         # Number of batches
         n_batches = int(u.size()[0])
 
-        # Outputs
-        outputs = Variable(torch.zeros(n_batches, time_length, self.output_dim, dtype=self.dtype))
-        outputs = outputs.cuda() if self.hidden.is_cuda else outputs
+        # Outputs, every entry is written below
+        if out is not None:
+            outputs = out
+        else:
+            outputs = torch.empty(
+                n_batches, max(time_length - washout, 0), self.output_dim, dtype=self.dtype, device=self.hidden.device
+            )
+        # end if
+
+        # Without feedbacks, Win.u + b for the whole sequences in one product, W.x is left in the loop
+        projected = not self.feedbacks
+        if projected:
+            u_proj = torch.matmul(u.to(self.w_in.dtype), self.w_in.t())
+            u_proj += self.w_bias.view(-1).to(u_proj.dtype)
+        # end if
+
+        # The tanh update runs as a single fused kernel
+        fused = projected and self.nonlin_func is torch.tanh and self.w.layout != torch.sparse_coo
+        if fused:
+            step = _get_step(_projected_step, self.compile_step)
+        # end if
 
         # For each batch
         for b in range(n_batches):
@@ -134,57 +238,66 @@ class ESNCell(nn.Module):
 
             # For each steps
             for t in range(time_length):
-                # Current input
-                ut = u[b, t]
-
-                # Compute input layer
-                u_win = self.w_in.mv(ut)
-
-                # Apply W to x
-                x_w = self.w.mv(self.hidden)
-
-                # Feedback or not
-                if self.feedbacks and self.training and y is not None:
-                    # Current target
-                    yt = y[b, t]
-
-                    # Compute feedback layer
-                    y_wfdb = self.w_fdb.mv(yt)
-
-                    # Add everything
-                    x = u_win + x_w + y_wfdb + self.w_bias
-                elif self.feedbacks and not self.training and w_out is not None:
-                    # Add bias
-                    bias_hidden = torch.cat((Variable(torch.ones(1)), self.hidden), dim=0)
-
-                    # Compute past output
-                    yt = w_out.t().mv(bias_hidden)
-
-                    # Normalize
-                    if self.normalize_feedbacks:
-                        yt -= torch.min(yt)
-                        yt /= torch.max(yt) - torch.min(yt)
-                        yt /= torch.sum(yt)
+                # State in the compute precision
+                hidden = self.hidden.to(self.w.dtype)
+
+                # Fused update, projected input, or separate operations
+                if fused:
+                    x = step(hidden, u_proj[b, t], self.w)
+                elif projected:
+                    x = self.nonlin_func(u_proj[b, t] + self.w.mv(hidden))
+                else:
+                    # Compute input layer
+                    u_win = self.w_in.mv(u[b, t].to(self.w_in.dtype))
+
+                    # Apply W to x
+                    x_w = self.w.mv(hidden)
+
+                    # Feedback or not
+                    if self.feedbacks and self.training and y is not None:
+                        # Current target
+                        yt = y[b, t]
+
+                        # Compute feedback layer
+                        y_wfdb = self.w_fdb.mv(yt)
+
+                        # Add everything
+                        x = u_win + x_w + y_wfdb + self.w_bias
+                    elif self.feedbacks and not self.training and w_out is not None:
+                        # Add bias
+                        bias_hidden = torch.cat((Variable(torch.ones(1)), self.hidden), dim=0)
+
+                        # Compute past output
+                        yt = w_out.t().mv(bias_hidden)
+
+                        # Normalize
+                        if self.normalize_feedbacks:
+                            yt -= torch.min(yt)
+                            yt /= torch.max(yt) - torch.min(yt)
+                            yt /= torch.sum(yt)
+                        # end if
+
+                        # Compute feedback layer
+                        y_wfdb = self.w_fdb.mv(yt)
+
+                        # Add everything
+                        x = u_win + x_w + y_wfdb + self.w_bias
+                    else:
+                        # Add everything
+                        x = u_win + x_w + self.w_bias
                     # end if
 
-                    # Compute feedback layer
-                    y_wfdb = self.w_fdb.mv(yt)
-
-                    # Add everything
-                    x = u_win + x_w + y_wfdb + self.w_bias
-                else:
-                    # Add everything
-                    x = u_win + x_w + self.w_bias
+                    # Apply activation function
+                    x = self.nonlin_func(x)
                 # end if
 
-                # Apply activation function
-                x = self.nonlin_func(x)
-
                 # Add to outputs
-                self.hidden.data = x.view(self.output_dim).data
+                self.hidden.data = x.view(self.output_dim).to(self.dtype).data
 
-                # New last state
-                outputs[b, t] = self.hidden
+                # New last state, after the washout
+                if t >= washout:
+                    outputs[b, t - washout] = self.hidden
+                # end if
             # end for
         # end for
 
@@ -197,7 +310,7 @@ class ESNCell(nn.Module):
         Init hidden layer
         :return: Initiated hidden layer
         """
-        return Variable(torch.zeros(self.output_dim, dtype=self.dtype), requires_grad=False)
+        return Variable(torch.zeros(self.output_dim, dtype=self.dtype, device=self.device), requires_grad=False)
         # return torch.zeros(self.output_dim)
     # end init_hidden
 
@@ -226,34 +339,144 @@ class ESNCell(nn.Module):
         Get W's spectral radius
         :return: W's spectral radius
         """
-        return echotorch.utils.spectral_radius(self.w)
+        if self.w.layout != torch.strided:
+            return echotorch.utils.spectral_radius(self.w.to_dense().to(self.dtype))
+        # end if
+        return echotorch.utils.spectral_radius(self.w.to(self.dtype))
     # end spectral_radius
 
     ###############################################
     # PRIVATE
     ###############################################
 
+    # Load buffers from a state dict
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """
+        Load buffers from a state dict. A sparse W can only be copied into a sparse W with the same non-zero entries,
+        so a sparse W, saved or current, is replaced by the saved W instead. A W regenerated from the seed is
+        rescaled with the saved scaling, the spectral radius estimate can differ slightly from one device to another.
+        :param state_dict: State dict
+        :param prefix: Prefix of this module's keys
+        """
+        # Regenerated W, scaled as when saved
+        key = prefix + 'w_scaling'
+        if key in state_dict and 'w_scaling' in self._buffers:
+            self._buffers['w'] = self.w * (state_dict[key].item() / self.w_scaling.item())
+        # end if
+
+        # Sparse W
+        key = prefix + 'w'
+        if key in state_dict and (self.w.layout != torch.strided or state_dict[key].layout != torch.strided):
+            self._buffers['w'] = state_dict[key].to(self.w.device).clone()
+        # end if
+        super(ESNCell, self)._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+    # end _load_from_state_dict
+
+    # Register a matrix as buffer
+    def _register_matrix(self, name, m, regenerable):
+        """
+        Register a matrix as buffer, out of the state dict if it is regenerated from the seed (torch >= 1.6)
+        :param name: Buffer name
+        :param m: Matrix
+        :param regenerable: Is the matrix regenerated from the seed on construction
+        """
+        if regenerable:
+            try:
+                self.register_buffer(name, m, persistent=False)
+                return
+            except TypeError:
+                pass
+            # end try
+        # end if
+        self.register_buffer(name, m)
+    # end _register_matrix
+
     # Generate W matrix
     def _generate_w(self, w, seed=None):
         """
         Generate W matrix
         :return:
         """
+        # Seeded generations are deterministic, reuse a previous one (whatever its target spectral radius)
+        cache_key = None
+        if w is None and seed is not None and self.cache_matrices:
+            cache_key = (
+                self.output_dim, self.w_distrib, self.w_sparsity, tuple(self.w_normal), seed, self.dtype,
+                str(self.device), self.sr_iterations if self.output_dim > 512 else None
+            )
+            if cache_key in _w_cache:
+                _w_cache.move_to_end(cache_key)
+                w, w_spectral_radius, np_state, torch_state = _w_cache[cache_key]
+
+                # Following generations draw from the same RNG states as without cache
+                np.random.set_state(np_state)
+                torch.set_rng_state(torch_state)
+
+                self._w_scaling = self.spectral_radius / w_spectral_radius
+                return Variable(w * self._w_scaling, requires_grad=False)
+            # end if
+        # end if
+
         # Initialize reservoir weight matrix
         if w is None:
-            w = self.generate_w(output_dim=self.output_dim, w_distrib=self.w_distrib, w_sparsity=self.w_sparsity, mean=self.w_normal[0], std=self.w_normal[1], seed=seed, dtype=self.dtype)
+            w = self.generate_w(output_dim=self.output_dim, w_distrib=self.w_distrib, w_sparsity=self.w_sparsity, mean=self.w_normal[0], std=self.w_normal[1], seed=seed, dtype=self.dtype, device=self.device)
         else:
-            if callable(w):
-                w = w(self.output_dim)
-            # end if
+            w = w(self.output_dim)
         # end if
 
-        # Scale it to spectral radius
-        w *= self.spectral_radius / echotorch.utils.spectral_radius(w)
+        # On the target device, where it is scaled
+        if self.device is not None:
+            w = w.to(self.device)
+        # end if
+
+        # Measure its spectral radius
+        w_spectral_radius = self._measure_spectral_radius(w)
+
+        # Cache the unscaled matrix, least recently used ones are dropped above the size limit
+        if cache_key is not None:
+            _w_cache[cache_key] = (w, w_spectral_radius, np.random.get_state(), torch.get_rng_state())
+            while sum(c[0].numel() * c[0].element_size() for c in _w_cache.values()) > _w_cache_max_bytes:
+                _w_cache.popitem(last=False)
+            # end while
+        # end if
 
-        return Variable(w, requires_grad=False)
+        # Scale it to spectral radius, the cached matrix is left unscaled
+        self._w_scaling = self.spectral_radius / w_spectral_radius
+        return Variable(w * self._w_scaling, requires_grad=False)
     # end generate_W
 
+    # Matrix given by the user as a generator
+    def _as_generator(self, m):
+        """
+        Matrix given by the user as a generator taking the matrix size
+        :param m: Tensor, callable or None (random generation)
+        :return: Callable, or None
+        """
+        if m is None or callable(m):
+            return m
+        # end if
+        return lambda *size: m
+    # end _as_generator
+
+    # Measure W's spectral radius
+    def _measure_spectral_radius(self, w):
+        """
+        Measure W's spectral radius
+        :param w: Reservoir weight matrix
+        :return: Spectral radius of W
+        """
+        # Small reservoirs, full eigendecomposition
+        if self.sr_iterations is None or self.output_dim <= 512:
+            return echotorch.utils.spectral_radius(w)
+        # end if
+
+        # Arnoldi iteration, on GPU if available
+        if torch.cuda.is_available():
+            w = w.cuda()
+        # end if
+        return echotorch.utils.arnoldi_spectral_radius(w, n_iterations=self.sr_iterations)
+    # end _measure_spectral_radius
+
     # Generate Win matrix
     def _generate_win(self, w_in, seed=None):
         """
@@ -277,13 +500,16 @@ class ESNCell(nn.Module):
                     w_in = torch.from_numpy(w_in.astype(np.float64))
                 # end if
             else:
-                w_in = self.generate_gaussian_matrix(size=(self.output_dim, self.input_dim), sparsity=self.sparsity, mean=self.win_normal[0], std=self.win_normal[1], dtype=self.dtype)
+                w_in = self.generate_gaussian_matrix(size=(self.output_dim, self.input_dim), sparsity=self.sparsity, mean=self.win_normal[0], std=self.win_normal[1], dtype=self.dtype, device=self.device)
             # end if
             w_in *= self.input_scaling
         else:
-            if callable(w_in):
-                w_in = w_in(self.output_dim, self.input_dim)
-            # end if
+            w_in = w_in(self.output_dim, self.input_dim)
+        # end if
+
+        # On the target device
+        if self.device is not None:
+            w_in = w_in.to(self.device)
         # end if
 
         return Variable(w_in, requires_grad=False)
@@ -311,13 +537,16 @@ class ESNCell(nn.Module):
                     w_bias = torch.from_numpy(w_bias.astype(np.float64))
                 # end if
             else:
-                w_bias = self.generate_gaussian_matrix(size=(1, self.output_dim), sparsity=1.0, mean=self.wbias_normal[0], std=self.wbias_normal[1], dtype=self.dtype)
+                w_bias = self.generate_gaussian_matrix(size=(1, self.output_dim), sparsity=1.0, mean=self.wbias_normal[0], std=self.wbias_normal[1], dtype=self.dtype, device=self.device)
             # end if
             w_bias *= self.bias_scaling
         else:
-            if callable((w_bias)):
-                w_bias = w_bias(self.output_dim)
-            # end if
+            w_bias = w_bias(self.output_dim)
+        # end if
+
+        # On the target device
+        if self.device is not None:
+            w_bias = w_bias.to(self.device)
         # end if
 
         return Variable(w_bias, requires_grad=False)
@@ -354,9 +583,12 @@ class ESNCell(nn.Module):
                 # end if
             # end if
         else:
-            if callable(w_fdb):
-                w_fdb = w_fdb(self.output_dim, self.feedbacks_dim)
-            # end if
+            w_fdb = w_fdb(self.output_dim, self.feedbacks_dim)
+        # end if
+
+        # On the target device
+        if self.device is not None:
+            w_fdb = w_fdb.to(self.device)
         # end if
 
         return Variable(w_fdb, requires_grad=False)
@@ -387,18 +619,18 @@ class ESNCell(nn.Module):
 
     # Generate gaussian matrix
     @staticmethod
-    def generate_gaussian_matrix(size, sparsity, mean=0.0, std=1.0, dtype=torch.float32):
+    def generate_gaussian_matrix(size, sparsity, mean=0.0, std=1.0, dtype=torch.float32, device=None):
         """
         Generate gaussian Win matrix
         :return:
         """
         if sparsity is None:
-            w = torch.zeros(size, dtype=dtype)
+            w = torch.zeros(size, dtype=dtype, device=device)
             w = w.normal_(mean=mean, std=std)
         else:
-            w = torch.zeros(size, dtype=dtype)
+            w = torch.zeros(size, dtype=dtype, device=device)
             w = w.normal_(mean=mean, std=std)
-            mask = torch.zeros(size, dtype=dtype)
+            mask = torch.zeros(size, dtype=dtype, device=device)
             mask.bernoulli_(p=sparsity)
             w *= mask
         # end if
@@ -407,7 +639,8 @@ class ESNCell(nn.Module):
 
     # Generate W matrix
     @staticmethod
-    def generate_w(output_dim, w_distrib='uniform', w_sparsity=None, mean=0.0, std=1.0, seed=None, dtype=torch.float32):
+    def generate_w(output_dim, w_distrib='uniform', w_sparsity=None, mean=0.0, std=1.0, seed=None, dtype=torch.float32,
+                   device=None):
         """
         Generate W matrix
         :param output_dim:
@@ -425,7 +658,7 @@ class ESNCell(nn.Module):
             w = ESNCell.generate_uniform_matrix(size=(output_dim, output_dim), sparsity=w_sparsity, input_set=[-1.0, 1.0])
             w = torch.from_numpy(w.astype(np.float32))
         else:
-            w = ESNCell.generate_gaussian_matrix(size=(output_dim, output_dim), sparsity=w_sparsity, mean=mean, std=std, dtype=dtype)
+            w = ESNCell.generate_gaussian_matrix(size=(output_dim, output_dim), sparsity=w_sparsity, mean=mean, std=std, dtype=dtype, device=device)
         # end if
 
         return w
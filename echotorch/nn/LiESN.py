@@ -42,7 +42,9 @@ class LiESN(ESN):
                  leaky_rate=1.0, train_leaky_rate=False, feedbacks=False, wfdb_sparsity=None,
                  normalize_feedbacks=False, softmax_output=False, seed=None, washout=0, w_distrib='uniform',
                  win_distrib='uniform', wbias_distrib='uniform', win_normal=(0.0, 1.0), w_normal=(0.0, 1.0),
-                 wbias_normal=(0.0, 1.0), dtype=torch.float32):
+                 wbias_normal=(0.0, 1.0), dtype=torch.float32, sr_iterations=50,
+                 sparse=False, chunk_size=None, device=None, cache_matrices=False, save_matrices=True,
+                 solve_device=None):
         """
         Constructor
         :param input_dim:
@@ -63,6 +65,13 @@ class LiESN(ESN):
         :param leaky_rate:
         :param train_leaky_rate:
         :param feedbacks:
+        :param sr_iterations:
+        :param sparse:
+        :param chunk_size:
+        :param device:
+        :param cache_matrices:
+        :param save_matrices:
+        :param solve_device:
         """
         super(LiESN, self).__init__(input_dim, hidden_dim, output_dim, spectral_radius=spectral_radius,
                                     bias_scaling=bias_scaling, input_scaling=input_scaling,
@@ -72,7 +81,10 @@ class LiESN(ESN):
                                     wfdb_sparsity=wfdb_sparsity, normalize_feedbacks=normalize_feedbacks,
                                     softmax_output=softmax_output, seed=seed, washout=washout, w_distrib=w_distrib,
                                     win_distrib=win_distrib, wbias_distrib=wbias_distrib, win_normal=win_normal,
-                                    w_normal=w_normal, wbias_normal=wbias_normal, dtype=torch.float32)
+                                    w_normal=w_normal, wbias_normal=wbias_normal, dtype=torch.float32,
+                                    sr_iterations=sr_iterations, sparse=sparse, chunk_size=chunk_size,
+                                    device=device, cache_matrices=cache_matrices, save_matrices=save_matrices,
+                                    solve_device=solve_device)
 
         # Recurrent layer
         self.esn_cell = LiESNCell(leaky_rate, train_leaky_rate, input_dim, hidden_dim, spectral_radius=spectral_radius,
@@ -82,7 +94,9 @@ class LiESN(ESN):
                                   feedbacks_dim=output_dim, wfdb_sparsity=wfdb_sparsity,
                                   normalize_feedbacks=normalize_feedbacks, seed=seed, w_distrib=w_distrib,
                                   win_distrib=win_distrib, wbias_distrib=wbias_distrib, win_normal=win_normal,
-                                  w_normal=w_normal, wbias_normal=wbias_normal, dtype=torch.float32)
+                                  w_normal=w_normal, wbias_normal=wbias_normal, dtype=torch.float32,
+                                  sr_iterations=sr_iterations, sparse=sparse, device=device,
+                                  cache_matrices=cache_matrices, save_matrices=save_matrices)
     # end __init__
 
     ###############################################
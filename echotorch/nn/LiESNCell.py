@@ -28,7 +28,7 @@ import torch
 import torch.sparse
 import torch.nn as nn
 from torch.autograd import Variable
-from .ESNCell import ESNCell
+from .ESNCell import ESNCell, _projected_step, _get_step
 import matplotlib.pyplot as plt
 
 
@@ -56,10 +56,10 @@ class LiESNCell(ESNCell):
 
         # Params
         if train_leaky_rate:
-            self.leaky_rate = nn.Parameter(tensor_type(1).fill_(leaky_rate), requires_grad=True)
+            self.leaky_rate = nn.Parameter(tensor_type(1).fill_(leaky_rate).to(self.hidden.device), requires_grad=True)
         else:
             # Initialize bias
-            self.register_buffer('leaky_rate', Variable(tensor_type(1).fill_(leaky_rate), requires_grad=False))
+            self.register_buffer('leaky_rate', Variable(tensor_type(1).fill_(leaky_rate).to(self.hidden.device), requires_grad=False))
         # end if
     # end __init__
 
@@ -68,10 +68,12 @@ class LiESNCell(ESNCell):
     ###############################################
 
     # Forward
-    def forward(self, u, y=None, w_out=None, reset_state=True):
+    def forward(self, u, y=None, w_out=None, reset_state=True, out=None, washout=0):
         """
         Forward
         :param u: Input signal.
+        :param out: Pre-allocated tensor for the hidden states (batch x time - washout x reservoir size)
+        :param washout: Number of initial time steps run without storing their states
         :return: Resulting hidden states.
         """
         # Time length
@@ -80,9 +82,30 @@ class LiESNCell(ESNCell):
         # Number of batches
         n_batches = int(u.size()[0])
 
-        # Outputs
-        outputs = Variable(torch.zeros(n_batches, time_length, self.output_dim, dtype=self.dtype))
-        outputs = outputs.cuda() if self.hidden.is_cuda else outputs
+        # Outputs, every entry is written below
+        if out is not None:
+            outputs = out
+        else:
+            outputs = torch.empty(
+                n_batches, max(time_length - washout, 0), self.output_dim, dtype=self.dtype, device=self.hidden.device
+            )
+        # end if
+
+        # Without feedbacks, Win.u + b for the whole sequences in one product, W.x is left in the loop
+        projected = not self.feedbacks
+        if projected:
+            u_proj = torch.matmul(u.to(self.w_in.dtype), self.w_in.t())
+            u_proj += self.w_bias.view(-1).to(u_proj.dtype)
+        # end if
+
+        # The tanh update runs as a single fused kernel
+        fused = projected and self.nonlin_func is torch.tanh and self.w.layout != torch.sparse_coo
+        if fused:
+            step = _get_step(_projected_step, self.compile_step)
+        # end if
+
+        # Leaky rate as a scalar for lerp
+        leaky_rate = float(self.leaky_rate)
 
         # For each batch
         for b in range(n_batches):
@@ -91,60 +114,75 @@ class LiESNCell(ESNCell):
                 self.reset_hidden()
             # end if
 
+            # State in the cell's precision, updated in place
+            x = self.hidden
+
             # For each steps
             for t in range(time_length):
-                # Current input
-                ut = u[b, t]
-
-                # Compute input layer
-                u_win = self.w_in.mv(ut)
-
-                # Apply W to x
-                x_w = self.w.mv(self.hidden)
-
-                # Feedback or not
-                if self.feedbacks and self.training and y is not None:
-                    # Current target
-                    yt = y[b, t]
-
-                    # Compute feedback layer
-                    y_wfdb = self.w_fdb.mv(yt)
-
-                    # Add everything
-                    x = u_win + x_w + y_wfdb + self.w_bias
-                elif self.feedbacks and not self.training and w_out is not None:
-                    # Add bias
-                    bias_hidden = torch.cat((Variable(torch.ones(1)), self.hidden), dim=0)
-
-                    # Compute past output
-                    yt = w_out.t().mv(bias_hidden)
-
-                    # Normalize
-                    if self.normalize_feedbacks:
-                        yt -= torch.min(yt)
-                        yt /= torch.max(yt) - torch.min(yt)
-                        yt /= torch.sum(yt)
+                # State in the compute precision for the products
+                x_c = x.to(self.w.dtype)
+
+                # Fused update, projected input, or separate operations
+                if fused:
+                    x_new = step(x_c, u_proj[b, t], self.w)
+                elif projected:
+                    x_new = self.nonlin_func(u_proj[b, t] + self.w.mv(x_c))
+                else:
+                    # Compute input layer
+                    u_win = self.w_in.mv(u[b, t].to(self.w_in.dtype))
+
+                    # Apply W to x
+                    x_w = self.w.mv(x_c)
+
+                    # Feedback or not
+                    if self.feedbacks and self.training and y is not None:
+                        # Current target
+                        yt = y[b, t]
+
+                        # Compute feedback layer
+                        y_wfdb = self.w_fdb.mv(yt)
+
+                        # Add everything
+                        x_new = u_win + x_w + y_wfdb + self.w_bias
+                    elif self.feedbacks and not self.training and w_out is not None:
+                        # Add bias
+                        bias_hidden = torch.cat((Variable(torch.ones(1)), x.to(w_out.dtype)), dim=0)
+
+                        # Compute past output
+                        yt = w_out.t().mv(bias_hidden)
+
+                        # Normalize
+                        if self.normalize_feedbacks:
+                            yt -= torch.min(yt)
+                            yt /= torch.max(yt) - torch.min(yt)
+                            yt /= torch.sum(yt)
+                        # end if
+
+                        # Compute feedback layer
+                        y_wfdb = self.w_fdb.mv(yt)
+
+                        # Add everything
+                        x_new = u_win + x_w + y_wfdb + self.w_bias
+                    else:
+                        # Add everything
+                        x_new = u_win + x_w + self.w_bias
                     # end if
 
-                    # Compute feedback layer
-                    y_wfdb = self.w_fdb.mv(yt)
-
-                    # Add everything
-                    x = u_win + x_w + y_wfdb + self.w_bias
-                else:
-                    # Add everything
-                    x = u_win + x_w + self.w_bias
+                    # Apply activation function
+                    x_new = self.nonlin_func(x_new.view(self.output_dim))
                 # end if
 
-                # Apply activation function
-                x = self.nonlin_func(x)
-
-                # Add to outputs
-                self.hidden.data = (self.hidden.mul(1.0 - self.leaky_rate) + x.view(self.output_dim).mul(self.leaky_rate)).data
+                # Leaky integration, x = (1 - a).x + a.x_new in one pass
+                x.lerp_(x_new.to(x.dtype), leaky_rate)
 
-                # New last state
-                outputs[b, t] = self.hidden
+                # New last state, after the washout
+                if t >= washout:
+                    outputs[b, t - washout] = x
+                # end if
             # end for
+
+            # Last state
+            self.hidden.data = x.data
         # end for
 
         return outputs
@@ -39,11 +39,12 @@ class RRCell(nn.Module):
     """
 
     # Constructor
-    def __init__(self, input_dim, output_dim, ridge_param=0.0, feedbacks=False, with_bias=True, learning_algo='inv', softmax_output=False, averaged=False, dtype=torch.float32):
+    def __init__(self, input_dim, output_dim, ridge_param=0.0, feedbacks=False, with_bias=True, learning_algo='inv', softmax_output=False, averaged=False, dtype=torch.float32, solve_device=None):
         """
         Constructor
         :param input_dim: Inputs dimension.
         :param output_dim: Reservoir size
+        :param solve_device: Device on which finalize solves the ridge regression (e.g. 'cuda'), w_out is moved back
         """
         super(RRCell, self).__init__()
 
@@ -59,6 +60,7 @@ class RRCell(nn.Module):
         self.averaged = averaged
         self.n_samples = 0
         self.dtype = dtype
+        self.solve_device = solve_device
 
         # Size
         if self.with_bias:
@@ -107,51 +109,88 @@ class RRCell(nn.Module):
         return self.w_out
     # end get_w_out
 
+    # Accumulate x^T.x and x^T.y
+    def accumulate(self, x, y, sample_length=None):
+        """
+        Accumulate x^T.x and x^T.y
+        :param x: Input signal (batch x time x input_dim)
+        :param y: Target outputs (batch x time x output_dim)
+        :param sample_length: Length of the whole samples if x is only a part of them (for averaged)
+        """
+        # Sizes
+        batch_size = x.size()[0]
+        time_length = x.size()[1]
+
+        # Nothing to accumulate
+        if time_length == 0:
+            return
+        # end if
+
+        # Averaged over time, a part of a sample counts as a fraction of sample
+        if self.averaged:
+            sample_length = sample_length if sample_length is not None else time_length
+            scale = 1.0 / sample_length
+            self.n_samples += batch_size * time_length / float(sample_length)
+        else:
+            scale = 1.0
+        # end if
+
+        # The bias is a constant input in first position
+        if self.with_bias:
+            x_sum = torch.sum(x.data, dim=(0, 1))
+            self.xTx.data[0, 0] += scale * batch_size * time_length
+            self.xTx.data[0, 1:].add_(x_sum, alpha=scale)
+            self.xTx.data[1:, 0].add_(x_sum, alpha=scale)
+            self.xTy.data[0].add_(torch.sum(y.data, dim=(0, 1)), alpha=scale)
+            xTx = self.xTx.data[1:, 1:]
+            xTy = self.xTy.data[1:]
+        else:
+            xTx = self.xTx.data
+            xTy = self.xTy.data
+        # end if
+
+        # For each batch
+        for b in range(batch_size):
+            xTx.addmm_(x[b].data.t(), x[b].data, alpha=scale)
+            xTy.addmm_(x[b].data.t(), y[b].data, alpha=scale)
+        # end for
+    # end accumulate
+
     # Forward
-    def forward(self, x, y=None):
+    def forward(self, x, y=None, washout=0):
         """
         Forward
         :param x: Input signal.
         :param y: Target outputs
+        :param washout: Number of initial time steps to ignore
         :return: Output or hidden states
         """
         # Batch size
         batch_size = x.size()[0]
 
-        # Time length
-        time_length = x.size()[1]
-
-        # Add bias
-        if self.with_bias:
-            x = self._add_constant(x)
-        # end if
+        # Time length without the washout (narrow gives a view, nothing is copied)
+        time_length = x.size()[1] - washout
+        x = x.narrow(1, washout, time_length)
 
         # Learning algo
         if self.training:
-            for b in range(batch_size):
-                if not self.averaged:
-                    self.xTx.data.add_(x[b].t().mm(x[b]).data)
-                    self.xTy.data.add_(x[b].t().mm(y[b]).data)
-                else:
-                    self.xTx.data.add_((x[b].t().mm(x[b]) / time_length).data)
-                    self.xTy.data.add_((x[b].t().mm(y[b]) / time_length).data)
-                    self.n_samples += 1.0
-            # end for
+            y = y.narrow(1, washout, time_length)
 
-            # Bias or not
-            if self.with_bias:
-                return x[:, :, 1:]
-            else:
-                return x
-            # end if
+            # Accumulate x^T.x and x^T.y
+            self.accumulate(x, y)
+
+            return x
         elif not self.training:
             # Outputs
-            outputs = Variable(torch.zeros(batch_size, time_length, self.output_dim, dtype=self.dtype), requires_grad=False)
-            outputs = outputs.cuda() if self.w_out.is_cuda else outputs
+            outputs = torch.empty(batch_size, time_length, self.output_dim, dtype=self.dtype, device=self.w_out.device)
 
-            # For each batch
+            # For each batch, the bias is the first row of w_out
             for b in range(batch_size):
-                outputs[b] = torch.mm(x[b], self.w_out)
+                if self.with_bias:
+                    torch.addmm(self.w_out[0], x[b], self.w_out[1:], out=outputs[b])
+                else:
+                    torch.mm(x[b], self.w_out, out=outputs[b])
+                # end if
             # end for
 
             if self.softmax_output:
@@ -164,27 +203,39 @@ class RRCell(nn.Module):
     # Finish training
     def finalize(self, train=False):
         """
-        Finalize training with LU factorization or Pseudo-inverse
+        Finalize training with Cholesky or LU factorization
         """
+        # Average
+        if self.averaged:
+            self.xTx = self.xTx / self.n_samples
+            self.xTy = self.xTy / self.n_samples
+        # end if
+
+        # Solve on the requested device, CUDA only if available
+        device = self.xTx.device
+        if self.solve_device is not None and (torch.device(self.solve_device).type != 'cuda' or torch.cuda.is_available()):
+            device = torch.device(self.solve_device)
+        # end if
+
+        # Gram matrices on the solve device
+        xTx = self.xTx.to(device, non_blocking=True)
+        xTy = self.xTy.to(device, non_blocking=True)
+
+        # Ridge
+        ridge_xTx = xTx + self.ridge_param * torch.eye(self.x_size, dtype=self.dtype, device=device)
+
+        # Solve (x^T.x + ridge.I).w_out = x^T.y
         if self.learning_algo == 'inv':
-            if not self.averaged:
-                ridge_xTx = self.xTx + self.ridge_param * torch.eye(self.input_dim + self.with_bias, dtype=self.dtype)
-                inv_xTx = ridge_xTx.inverse()
-                self.w_out.data = torch.mm(inv_xTx, self.xTy).data
-            else:
-                # Average
-                self.xTx = self.xTx / self.n_samples
-                self.xTy = self.xTy / self.n_samples
-
-                # Algo
-                ridge_xTx = self.xTx + self.ridge_param * torch.eye(self.input_dim + self.with_bias, dtype=self.dtype)
-                inv_xTx = ridge_xTx.inverse()
-                self.w_out.data = torch.mm(inv_xTx, self.xTy).data
-            # end if
+            w_out = self._cholesky_solve(ridge_xTx, xTy)
+        elif hasattr(torch, 'linalg') and hasattr(torch.linalg, 'solve'):
+            w_out = torch.linalg.solve(ridge_xTx, xTy)
         else:
-            self.w_out.data = torch.gesv(self.xTy, self.xTx + torch.eye(self.esn_cell.output_dim).mul(self.ridge_param)).data
+            w_out = torch.solve(xTy, ridge_xTx)[0]
         # end if
 
+        # Back on the device of the cell
+        self.w_out.data = w_out.to(self.xTx.device).data
+
         # Not in training mode anymore
         self.train(train)
     # end finalize
@@ -193,19 +244,41 @@ class RRCell(nn.Module):
     # PRIVATE
     ###############################################
 
-    # Add constant
-    def _add_constant(self, x):
+    # Solve a.x = b for a symmetric positive semi-definite
+    def _cholesky_solve(self, a, b):
         """
-        Add constant
-        :param x:
-        :return:
+        Solve a.x = b for a symmetric positive semi-definite, with a Cholesky factorization
+        (half the flops of an inversion and better conditioned), or least squares if a is singular
+        :param a: Symmetric positive semi-definite matrix
+        :param b: Right-hand side
+        :return: Solution x
         """
-        if x.is_cuda:
-            bias = Variable(torch.ones((x.size()[0], x.size()[1], 1), dtype=self.dtype).cuda(), requires_grad=False)
-        else:
-            bias = Variable(torch.ones((x.size()[0], x.size()[1], 1), dtype=self.dtype), requires_grad=False)
+        linalg = hasattr(torch, 'linalg') and hasattr(torch.linalg, 'cholesky')
+        try:
+            l = torch.linalg.cholesky(a) if linalg else torch.cholesky(a)
+            return torch.cholesky_solve(b, l)
+        except RuntimeError:
+            # Singular, e.g. without ridge
+            if linalg:
+                return torch.linalg.lstsq(a, b).solution
+            # end if
+            return torch.lstsq(b, a)[0][:a.size(1)]
+        # end try
+    # end _cholesky_solve
+
+    # Load buffers from a state dict
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """
+        Load buffers from a state dict, w_out of a finalized cell (with the bias row) has another shape than before
+        training and is loaded with its own shape
+        :param state_dict: State dict
+        :param prefix: Prefix of this module's keys
+        """
+        key = prefix + 'w_out'
+        if key in state_dict and state_dict[key].size() != self.w_out.size():
+            self.w_out.data = torch.zeros(state_dict[key].size(), dtype=self.w_out.dtype, device=self.w_out.device)
         # end if
-        return torch.cat((bias, x), dim=2)
-    # end _add_constant
+        super(RRCell, self)._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+    # end _load_from_state_dict
 
 # end RRCell
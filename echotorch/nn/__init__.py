@@ -13,6 +13,7 @@ from .ESNCell import ESNCell
 from .ESN import ESN
 from .LiESNCell import LiESNCell
 from .LiESN import LiESN
+from .BatchedESN import BatchedESN
 from .GatedESN import GatedESN
 from .ICACell import ICACell
 from .Identity import Identity
@@ -23,5 +24,6 @@ from .StackedESN import StackedESN
 
 __all__ = [
     'BDESN', 'BDESNPCA', 'BDESNCell', 'Conceptor', 'ConceptorNet', 'ConceptorNetCell', 'ConceptorPool', 'ESNCell',
-    'ESN', 'LiESNCell', 'LiESN', 'GatedESN', 'ICACell', 'Identity', 'PCACell', 'RRCell', 'SFACell', 'StackedESN'
+    'ESN', 'LiESNCell', 'LiESN', 'BatchedESN', 'GatedESN', 'ICACell', 'Identity', 'PCACell', 'RRCell', 'SFACell',
+    'StackedESN'
 ]
@@ -166,10 +166,84 @@ def spectral_radius(m):
     :param m: squared 2D tensor
     :return:
     """
-    return torch.max(torch.abs(torch.eig(m)[0])).item()
+    if hasattr(torch, 'linalg') and hasattr(torch.linalg, 'eigvals'):
+        return torch.max(torch.abs(torch.linalg.eigvals(m))).item()
+    # end if
+    return torch.max(torch.norm(torch.eig(m)[0], dim=1)).item()
 # end spectral_radius
 
 
+# Estimate spectral radius of a square 2-D tensor with the Arnoldi iteration
+def arnoldi_spectral_radius(m, n_iterations=50, tol=1e-3):
+    """
+    Estimate spectral radius of a square 2-D tensor with the Arnoldi iteration.
+    m is projected on a Krylov subspace of size k, and the spectral radius of the k x k Hessenberg
+    projection approximates the one of m (k matrix-vector products, O(k.N^2) instead of O(N^3)).
+    With many eigenvalues near the radius (e.g. random reservoirs), a small subspace underestimates it,
+    so the subspace is doubled until the estimate changes by less than tol.
+    :param m: squared 2D tensor
+    :param n_iterations: Initial size of the Krylov subspace
+    :param tol: Relative change of the estimate under which it is considered stable
+    :return: Estimated spectral radius
+    """
+    # Sizes
+    n = m.size(0)
+    k = min(n_iterations, n)
+
+    # Orthonormal basis and Hessenberg projection
+    q = torch.zeros(k + 1, n, dtype=m.dtype, device=m.device)
+    h = torch.zeros(k + 1, k, dtype=m.dtype, device=m.device)
+
+    # Random starting vector from a fixed CPU generator, the same on every device
+    v = torch.rand(n, generator=torch.Generator().manual_seed(0), dtype=m.dtype).to(m.device)
+    q[0] = v / torch.norm(v)
+
+    # Estimate with the previous subspace
+    last_estimate = None
+    start = 0
+    invariant = False
+
+    while True:
+        # Extend the basis up to k vectors
+        for j in range(start, k):
+            v = torch.mv(m, q[j])
+
+            # Orthogonalize against the basis, twice for numerical stability
+            for _ in range(2):
+                c = torch.mv(q[:j + 1], v)
+                v -= torch.mv(q[:j + 1].t(), c)
+                h[:j + 1, j] += c
+            # end for
+            h[j + 1, j] = torch.norm(v)
+
+            # Invariant subspace found
+            if h[j + 1, j] <= 1e-6 * torch.norm(h[:j + 2, j]):
+                k = j + 1
+                invariant = True
+                break
+            # end if
+
+            q[j + 1] = v / h[j + 1, j]
+        # end for
+
+        # Estimate, exact for an invariant or full subspace, otherwise stable when it stops moving
+        estimate = spectral_radius(h[:k, :k])
+        if invariant or k == n or (last_estimate is not None and abs(estimate - last_estimate) <= tol * estimate):
+            return estimate
+        # end if
+        last_estimate = estimate
+
+        # Double the subspace
+        start = k
+        k = min(2 * k, n)
+        q = torch.cat((q, torch.zeros(k - start, n, dtype=m.dtype, device=m.device)))
+        h_next = torch.zeros(k + 1, k, dtype=m.dtype, device=m.device)
+        h_next[:start + 1, :start] = h
+        h = h_next
+    # end while
+# end arnoldi_spectral_radius
+
+
 # Compute spectral radius of a square 2-D tensor for stacked-ESN
 def deep_spectral_radius(m, leaky_rate):
     """
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# File : test/test_batched_esn
+# Description : Batched ESN test case.
+# Date : 15th of October, 2026
+#
+# This file is part of EchoTorch.  EchoTorch is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright Nils Schaetti <nils.schaetti@unine.ch>
+
+# Imports
+import unittest
+from unittest import TestCase
+import copy
+import torch
+import echotorch.nn as etnn
+
+
+# Test independent ESNs run together
+class Test_Batched_ESN(TestCase):
+    """
+    Test independent ESNs run together
+    """
+
+    ##############################
+    # TESTS
+    ##############################
+
+    # BatchedESN matches the standalone ESNs
+    def test_matches_standalone(self):
+        """
+        BatchedESN matches the standalone ESN and LiESN models
+        :return:
+        """
+        # Data
+        torch.manual_seed(1)
+        u = torch.rand(3, 60, 2)
+        y = torch.rand(3, 60, 1)
+
+        # ESNs of a sweep, with a leaky one
+        esns = [
+            etnn.ESN(2, 30, 1, spectral_radius=0.5, ridge_param=0.01, washout=10, seed=1, bias_scaling=0.2),
+            etnn.ESN(2, 30, 1, spectral_radius=0.9, ridge_param=0.01, washout=10, seed=1, bias_scaling=0.2),
+            etnn.LiESN(2, 30, 1, leaky_rate=0.4, ridge_param=0.01, washout=10, seed=2)
+        ]
+
+        # Standalone
+        standalone_states = list()
+        standalone_outputs = list()
+        for esn in copy.deepcopy(esns):
+            standalone_states.append(esn.esn_cell(u).clone())
+            esn(u, y)
+            esn.finalize()
+            standalone_outputs.append(esn(u))
+        # end for
+
+        # Together
+        batched_esn = etnn.BatchedESN(esns)
+        batched_states = batched_esn.hidden_states(u)
+        batched_esn(u, y)
+        batched_esn.finalize()
+        batched_outputs = batched_esn(u)
+
+        # Compare
+        for k in range(len(esns)):
+            self.assertTrue(torch.allclose(batched_states[k], standalone_states[k], atol=1e-5))
+            self.assertTrue(torch.allclose(batched_outputs[k], standalone_outputs[k], atol=1e-3))
+        # end for
+    # end test_matches_standalone
+
+    # Different activation functions are rejected
+    def test_different_activations(self):
+        """
+        Different activation functions are rejected
+        :return:
+        """
+        with self.assertRaises(ValueError):
+            etnn.BatchedESN([etnn.ESN(2, 20, 1), etnn.ESN(2, 20, 1, nonlin_func=torch.relu)])
+        # end with
+    # end test_different_activations
+
+# end Test_Batched_ESN
+
+
+# Run test
+if __name__ == '__main__':
+    unittest.main()
+# end if
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# File : test/test_cholesky_finalize
+# Description : Ridge regression solve test case.
+# Date : 15th of October, 2026
+#
+# This file is part of EchoTorch.  EchoTorch is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright Nils Schaetti <nils.schaetti@unine.ch>
+
+# Imports
+import unittest
+from unittest import TestCase
+import torch
+import echotorch.nn as etnn
+
+
+# Test the ridge regression solve of RRCell
+class Test_Cholesky_Finalize(TestCase):
+    """
+    Test the ridge regression solve of RRCell
+    """
+
+    ##############################
+    # TESTS
+    ##############################
+
+    # Cholesky solve matches the inverse
+    def test_matches_inverse(self):
+        """
+        Cholesky solve matches (x^T.x + ridge.I)^-1.x^T.y
+        :return:
+        """
+        # Data
+        torch.manual_seed(1)
+        x = torch.rand(2, 200, 10, dtype=torch.float64)
+        y = torch.rand(2, 200, 3, dtype=torch.float64)
+
+        # Train
+        rr_cell = etnn.RRCell(10, 3, ridge_param=0.01, learning_algo='inv', dtype=torch.float64)
+        rr_cell(x, y)
+
+        # With the inverse
+        ridge_xTx = rr_cell.xTx + 0.01 * torch.eye(rr_cell.x_size, dtype=torch.float64)
+        w_out = torch.inverse(ridge_xTx).mm(rr_cell.xTy)
+
+        # With Cholesky
+        rr_cell.finalize()
+
+        self.assertTrue(torch.allclose(rr_cell.w_out, w_out, atol=1e-8))
+    # end test_matches_inverse
+
+# end Test_Cholesky_Finalize
+
+
+# Run test
+if __name__ == '__main__':
+    unittest.main()
+# end if
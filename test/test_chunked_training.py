@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# File : test/test_chunked_training
+# Description : Chunked ESN training test case.
+# Date : 15th of October, 2026
+#
+# This file is part of EchoTorch.  EchoTorch is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright Nils Schaetti <nils.schaetti@unine.ch>
+
+# Imports
+import unittest
+from unittest import TestCase
+import torch
+import echotorch.nn as etnn
+
+
+# Test ESN training by chunks
+class Test_Chunked_Training(TestCase):
+    """
+    Test ESN training by chunks
+    """
+
+    ##############################
+    # TESTS
+    ##############################
+
+    # Chunked training gives the same output weights
+    def test_same_w_out(self):
+        """
+        Chunked training gives the same output weights as training on whole sequences
+        :return:
+        """
+        # Data
+        torch.manual_seed(1)
+        u = torch.rand(3, 100, 2)
+        y = torch.rand(3, 100, 1)
+
+        # Same ESN trained on whole sequences and by chunks (with the washout across chunks)
+        xTxs = list()
+        w_outs = list()
+        for chunk_size in (None, 16):
+            esn = etnn.ESN(2, 30, 1, ridge_param=0.01, washout=20, seed=1, bias_scaling=0.5, chunk_size=chunk_size)
+            esn(u, y)
+            xTxs.append(esn.output.xTx.clone())
+            esn.finalize()
+            w_outs.append(esn.get_w_out())
+        # end for
+
+        self.assertTrue(torch.allclose(xTxs[0], xTxs[1], atol=1e-5))
+        self.assertTrue(torch.allclose(w_outs[0], w_outs[1], atol=1e-4))
+    # end test_same_w_out
+
+# end Test_Chunked_Training
+
+
+# Run test
+if __name__ == '__main__':
+    unittest.main()
+# end if
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# File : test/test_matrix_cache
+# Description : Reservoir matrix cache test case.
+# Date : 15th of October, 2026
+#
+# This file is part of EchoTorch.  EchoTorch is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright Nils Schaetti <nils.schaetti@unine.ch>
+
+# Imports
+import unittest
+from unittest import TestCase
+import torch
+import echotorch.nn as etnn
+
+
+# Test the cache of seeded reservoir matrices
+class Test_Matrix_Cache(TestCase):
+    """
+    Test the cache of seeded reservoir matrices
+    """
+
+    ##############################
+    # TESTS
+    ##############################
+
+    # A cache hit builds the same network
+    def test_same_network(self):
+        """
+        A cache hit builds exactly the same network as without cache, for every spectral radius
+        :return:
+        """
+        for spectral_radius in (0.9, 0.5, 1.2):
+            # With cache (hit after the first radius) and without
+            cached = etnn.LiESN(
+                2, 40, 1, spectral_radius=spectral_radius, leaky_rate=0.5, bias_scaling=0.3, seed=3,
+                cache_matrices=True
+            )
+            uncached = etnn.LiESN(
+                2, 40, 1, spectral_radius=spectral_radius, leaky_rate=0.5, bias_scaling=0.3, seed=3,
+                cache_matrices=False
+            )
+
+            # Same buffers
+            cached_state = cached.state_dict()
+            uncached_state = uncached.state_dict()
+            self.assertEqual(sorted(cached_state.keys()), sorted(uncached_state.keys()))
+            for key in cached_state:
+                self.assertTrue(torch.equal(cached_state[key], uncached_state[key]), key)
+            # end for
+        # end for
+    # end test_same_network
+
+# end Test_Matrix_Cache
+
+
+# Run test
+if __name__ == '__main__':
+    unittest.main()
+# end if
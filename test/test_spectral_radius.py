@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# File : test/test_spectral_radius
+# Description : Spectral radius estimate test case.
+# Date : 15th of October, 2026
+#
+# This file is part of EchoTorch.  EchoTorch is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright Nils Schaetti <nils.schaetti@unine.ch>
+
+# Imports
+import unittest
+from unittest import TestCase
+import torch
+import echotorch.nn as etnn
+import echotorch.utils
+
+
+# Test the spectral radius estimate of large reservoirs
+class Test_Spectral_Radius(TestCase):
+    """
+    Test the spectral radius estimate of large reservoirs
+    """
+
+    ##############################
+    # TESTS
+    ##############################
+
+    # Arnoldi estimate matches the eigendecomposition
+    def test_arnoldi_estimate(self):
+        """
+        Arnoldi estimate matches the eigendecomposition above 512 units
+        :return:
+        """
+        for reservoir_size, w_sparsity in ((600, 0.1), (1000, 0.1), (800, None)):
+            w = etnn.ESNCell.generate_w(reservoir_size, w_sparsity=w_sparsity, seed=4)
+            estimate = echotorch.utils.arnoldi_spectral_radius(w)
+            exact = echotorch.utils.spectral_radius(w)
+            self.assertAlmostEqual(estimate / exact, 1.0, delta=1e-3)
+        # end for
+    # end test_arnoldi_estimate
+
+    # Large reservoirs are not scaled above their target
+    def test_scaled_reservoir(self):
+        """
+        Large reservoirs are not scaled above their target spectral radius
+        :return:
+        """
+        esn = etnn.ESN(1, 1000, 1, spectral_radius=0.99, w_sparsity=0.1, seed=4)
+        self.assertAlmostEqual(esn.esn_cell.get_spectral_radius(), 0.99, delta=1e-3)
+    # end test_scaled_reservoir
+
+# end Test_Spectral_Radius
+
+
+# Run test
+if __name__ == '__main__':
+    unittest.main()
+# end if
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# File : test/test_state_dict.py
+# Description : Test saving and loading ESNs through their state dict.
+# Date : 15th of October, 2026
+#
+# This file is part of EchoTorch.  EchoTorch is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright Nils Schaetti <nils.schaetti@unine.ch>
+
+# Imports
+import unittest
+from unittest import TestCase
+import io
+import torch
+import echotorch.nn as etnn
+
+
+# Test saving and loading ESNs through their state dict
+class Test_State_Dict(TestCase):
+    """
+    Test saving and loading ESNs through their state dict
+    """
+
+    ##############################
+    # TESTS
+    ##############################
+
+    # Sparse reservoir round trip
+    def test_sparse_round_trip(self):
+        """
+        A trained ESN with a sparse W loaded into a fresh one gives the same outputs
+        :return:
+        """
+        esn, loaded = self._round_trip(dict(w_sparsity=0.1, sparse=True, bias_scaling=0.5))
+        self.assertNotEqual(loaded.esn_cell.w.layout, torch.strided)
+        self._assert_same_outputs(esn, loaded)
+    # end test_sparse_round_trip
+
+    # Seeded reservoir round trip without the matrices
+    def test_seeded_round_trip(self):
+        """
+        A trained ESN saved without its seeded matrices, loaded into a fresh one with the same seed, gives the same
+        outputs, also when the fresh one estimated another spectral radius
+        :return:
+        """
+        for skew in (1.0, 1.01):
+            esn, loaded = self._round_trip(dict(seed=5, save_matrices=False, bias_scaling=0.5), skew=skew)
+            self.assertNotIn('esn_cell.w', esn.state_dict())
+            self._assert_same_outputs(esn, loaded)
+        # end for
+    # end test_seeded_round_trip
+
+    ##############################
+    # PRIVATE
+    ##############################
+
+    # Train an ESN, save it and load it into a fresh one
+    def _round_trip(self, kwargs, skew=1.0):
+        """
+        Train an ESN, save it and load it into a fresh one
+        :param kwargs: ESN arguments of both networks
+        :param skew: Error on the fresh ESN's scaling of a regenerated W
+        :return: Trained and loaded ESNs
+        """
+        # Data
+        torch.manual_seed(1)
+        u = torch.rand(2, 80, 2)
+        y = torch.rand(2, 80, 1)
+
+        # Trained ESN
+        esn = etnn.ESN(2, 100, 1, washout=10, **kwargs)
+        esn(u, y)
+        esn.finalize()
+
+        # Save and load into a fresh ESN
+        buffer = io.BytesIO()
+        torch.save(esn.state_dict(), buffer)
+        buffer.seek(0)
+        loaded = etnn.ESN(2, 100, 1, washout=10, **kwargs)
+        if skew != 1.0:
+            loaded.esn_cell.w *= skew
+            loaded.esn_cell.w_scaling *= skew
+        # end if
+        loaded.load_state_dict(torch.load(buffer))
+        loaded.train(False)
+
+        return esn, loaded
+    # end _round_trip
+
+    # Both ESNs give the same outputs
+    def _assert_same_outputs(self, esn, loaded):
+        """
+        Both ESNs give the same outputs
+        :param esn: Trained ESN
+        :param loaded: Loaded ESN
+        """
+        u = torch.rand(2, 50, 2)
+        self.assertTrue(torch.allclose(esn(u), loaded(u), atol=1e-6))
+    # end _assert_same_outputs
+
+# end Test_State_Dict
+
+
+# Run test
+if __name__ == '__main__':
+    unittest.main()
+# end if